@@ -1,29 +1,12 @@
-import random
-from copy import deepcopy
-from src.DBWSA import TrafficSignalAllocator  
+from src.DBWSA import TrafficSignalAllocator, VEHICLE_TYPES
 from schema.intersections import IntersectionData
 from typing import Dict
 import matplotlib.pyplot as plt
 import numpy as np
 
 
-def generate_random_traffic(mu=30, sigma=10) -> IntersectionData:
-    vehicle_types = ["bicycle", "motorcycle", "car", "bus", "truck"]
-    intersection_data = {"intersection": {}}
-
-    for i in range(1, 5):  # road1 to road4
-        vehicle_counts = {v: max(0, int(random.gauss(mu * (1 if v == "car" else 0.1), sigma))) for v in vehicle_types}
-        total_vehicles = sum(vehicle_counts.values())
-        road_length = random.choice([200, 250, 275, 300])  # Simulated variability
-
-        intersection_data["intersection"][f"road{i}"] = {
-            "vehicle_counts": vehicle_counts,
-            "total_vehicles": total_vehicles,
-            "road_length": road_length
-        }
-
-    IntersectionData.model_validate(intersection_data)
-    return intersection_data
+# Shared generator for all benchmark sampling
+rng = np.random.default_rng()
 
 
 def fixed_time_allocation(num_roads=4, cycle_time=60, yellow_time=3) -> Dict[str, Dict[str, int]]:
@@ -41,102 +24,103 @@ def fixed_time_allocation(num_roads=4, cycle_time=60, yellow_time=3) -> Dict[str
     return signal_times
 
 
-def calculate_effective_vehicles(vehicle_counts: Dict[str, int], vehicle_weights: Dict[str, float]) -> float:
-    return sum(vehicle_counts.get(v, 0) * vehicle_weights.get(v, 0) for v in vehicle_counts)
+def generate_random_traffic_batch(iterations: int, num_roads=4, mu=30, sigma=10, seed=None) -> Dict[str, np.ndarray]:
+    """
+    Sample traffic for all benchmark iterations at once as a struct of arrays.
+    Vehicle types follow the order of `src.DBWSA.VEHICLE_TYPES`.
+    """
+    generator = rng if seed is None else np.random.default_rng(seed)
+    mu_vec = np.array([0.1, 0.1, 1, 0.1, 0.1]) * mu  # Per type mean in VEHICLE_TYPES order, cars dominate
 
-def run_benchmark(iterations=500):
-    allocator = TrafficSignalAllocator()
-    vehicle_weights = allocator.vehicle_weights
-
-    total_dbwsa_weighted_green = 0
-    total_fixed_weighted_green = 0
+    vehicle_counts = np.clip(generator.normal(mu_vec, sigma, size=(iterations, num_roads, len(VEHICLE_TYPES))), 0, None).astype(np.int32)
+    road_length = generator.choice([200, 250, 275, 300], size=(iterations, num_roads))  # Simulated variability
 
-    # Initialize metrics tracking
-    metrics = {
-        "iteration": [],
-        "dbwsa_avg_green": [],
-        "fixed_avg_green": [],
-        "improvement_percent": []
+    return {
+        "vehicle_counts": vehicle_counts,
+        "total_vehicles": vehicle_counts.sum(axis=-1),
+        "road_length": road_length
     }
 
-    # Track max values
-    max_dbwsa_avg = -float("inf")
-    max_fixed_avg = -float("inf")
-    max_improvement = -float("inf")
-
-    max_dbwsa_iter = -1
-    max_fixed_iter = -1
-    max_improvement_iter = -1
-
-    for i in range(iterations):
-        print(f"\nIteration {i + 1}")
-
-        traffic_data = generate_random_traffic()
-        traffic_data_copy = deepcopy(traffic_data)
-
-        # DBWSA Allocation
-        dbwsa_result = allocator.allocate_signal_times(traffic_data)
-
-        # Fixed Time Allocation
-        fixed_result = fixed_time_allocation()
 
-        # Calculate weighted green times
-        dbwsa_weighted_sum = 0
-        fixed_weighted_sum = 0
-        total_effective_vehicles = 0
-
-        for road, data in traffic_data["intersection"].items():
-            eff_vehicles = calculate_effective_vehicles(data["vehicle_counts"], vehicle_weights)
-            total_effective_vehicles += eff_vehicles
-
-            dbwsa_green = dbwsa_result[road]["Green"]
-            fixed_green = fixed_result[road]["Green"]
-
-            dbwsa_weighted_sum += dbwsa_green * eff_vehicles
-            fixed_weighted_sum += fixed_green * eff_vehicles
-
-        dbwsa_avg_green = dbwsa_weighted_sum / total_effective_vehicles if total_effective_vehicles else 0
-        fixed_avg_green = fixed_weighted_sum / total_effective_vehicles if total_effective_vehicles else 0
-
-        total_dbwsa_weighted_green += dbwsa_avg_green
-        total_fixed_weighted_green += fixed_avg_green
-
-        improvement = ((dbwsa_avg_green - fixed_avg_green) / fixed_avg_green * 100) if fixed_avg_green else 0
+def intersection_data_at(traffic: Dict[str, np.ndarray], iteration: int) -> Dict:
+    """
+    Build the IntersectionData shaped dict of one iteration of a traffic batch.
+    """
+    return {
+        "intersection": {
+            f"road{road + 1}": {
+                "vehicle_counts": dict(zip(VEHICLE_TYPES, traffic["vehicle_counts"][iteration, road].tolist())),
+                "total_vehicles": int(traffic["total_vehicles"][iteration, road]),
+                "road_length": int(traffic["road_length"][iteration, road])
+            }
+            for road in range(traffic["road_length"].shape[1])
+        }
+    }
 
-        # Update max trackers
-        if dbwsa_avg_green > max_dbwsa_avg:
-            max_dbwsa_avg = dbwsa_avg_green
-            max_dbwsa_iter = i + 1
 
-        if fixed_avg_green > max_fixed_avg:
-            max_fixed_avg = fixed_avg_green
-            max_fixed_iter = i + 1
+def run_benchmark(iterations=500, seed=None, verbose=False):
+    allocator = TrafficSignalAllocator()
+    num_roads = 4
 
-        if improvement > max_improvement:
-            max_improvement = improvement
-            max_improvement_iter = i + 1
+    traffic = generate_random_traffic_batch(iterations, num_roads=num_roads, seed=seed)
 
-        # Logging
-        print("DBWSA Signal Allocation:")
-        for road, timings in dbwsa_result.items():
-            print(f"{road}: {timings}")
-        print("Fixed-Time Allocation:")
-        for road, timings in fixed_result.items():
-            print(f"{road}: {timings}")
-        print(f"Weighted Avg Green Time per Vehicle:")
-        print(f"  DBWSA:  {dbwsa_avg_green:.2f} sec")
-        print(f"  Fixed:  {fixed_avg_green:.2f} sec")
-        print(f"Improvement of DBWSA over Fixed: {improvement:.2f}%")
+    # Smoke test the generated data against the schema once instead of every iteration
+    IntersectionData.model_validate(intersection_data_at(traffic, 0))
 
-        # Store metrics
-        metrics["iteration"].append(i + 1)
-        metrics["dbwsa_avg_green"].append(dbwsa_avg_green)
-        metrics["fixed_avg_green"].append(fixed_avg_green)
-        metrics["improvement_percent"].append(improvement)
+    # DBWSA green times and weighted vehicle counts per road, shape (iterations, num_roads)
+    dbwsa_green = np.empty((iterations, num_roads), dtype=np.int64)
+    eff_vehicles = np.empty((iterations, num_roads))
+    dbwsa_results = []
+    for i in range(iterations):
+        traffic_data = intersection_data_at(traffic, i)
+        dbwsa_result = allocator.allocate_signal_times(traffic_data)
+        dbwsa_results.append(dbwsa_result)
+        for road, (name, data) in enumerate(traffic_data["intersection"].items()):
+            dbwsa_green[i, road] = dbwsa_result[name]["Green"]
+            eff_vehicles[i, road] = allocator.calculate_effective_vehicles(data["vehicle_counts"])
+    total_effective_vehicles = eff_vehicles.sum(axis=-1)
+
+    # Fixed Time Allocation green times
+    fixed_result = fixed_time_allocation(num_roads=num_roads)
+    fixed_green = np.array([fixed_result[f"road{i}"]["Green"] for i in range(1, num_roads + 1)])
+
+    # Weighted average green time per vehicle for every iteration
+    has_vehicles = total_effective_vehicles > 0
+    dbwsa_avg_green = np.divide((dbwsa_green * eff_vehicles).sum(axis=-1), total_effective_vehicles,
+                                out=np.zeros(iterations), where=has_vehicles)
+    fixed_avg_green = np.divide((fixed_green * eff_vehicles).sum(axis=-1), total_effective_vehicles,
+                                out=np.zeros(iterations), where=has_vehicles)
+
+    improvement = np.divide((dbwsa_avg_green - fixed_avg_green) * 100, fixed_avg_green,
+                            out=np.zeros(iterations), where=fixed_avg_green != 0)
+
+    # Track max values (first occurrence, 1-based iteration)
+    max_dbwsa_iter = int(np.argmax(dbwsa_avg_green)) + 1
+    max_fixed_iter = int(np.argmax(fixed_avg_green)) + 1
+    max_improvement_iter = int(np.argmax(improvement)) + 1
+
+    max_dbwsa_avg = float(dbwsa_avg_green[max_dbwsa_iter - 1])
+    max_fixed_avg = float(fixed_avg_green[max_fixed_iter - 1])
+    max_improvement = float(improvement[max_improvement_iter - 1])
+
+    # Logging
+    if verbose:
+        for i in range(iterations):
+            print(f"\nIteration {i + 1}")
+            print("DBWSA Signal Allocation:")
+            for road, timings in dbwsa_results[i].items():
+                print(f"{road}: {timings}")
+            print("Fixed-Time Allocation:")
+            for road, timings in fixed_result.items():
+                print(f"{road}: {timings}")
+            print(f"Weighted Avg Green Time per Vehicle:")
+            print(f"  DBWSA:  {dbwsa_avg_green[i]:.2f} sec")
+            print(f"  Fixed:  {fixed_avg_green[i]:.2f} sec")
+            print(f"Improvement of DBWSA over Fixed: {improvement[i]:.2f}%")
 
     # Overall summary
-    avg_dbwsa = total_dbwsa_weighted_green / iterations
-    avg_fixed = total_fixed_weighted_green / iterations
+    avg_dbwsa = float(dbwsa_avg_green.mean())
+    avg_fixed = float(fixed_avg_green.mean())
     overall_improvement = ((avg_dbwsa - avg_fixed) / avg_fixed * 100) if avg_fixed else 0
 
     print("\n==== Overall Benchmark Summary ====")
@@ -149,6 +133,14 @@ def run_benchmark(iterations=500):
     print(f"Max Fixed Avg Green:     {max_fixed_avg:.2f} sec at Iteration {max_fixed_iter}")
     print(f"Max Improvement Percent: {max_improvement:.2f}% at Iteration {max_improvement_iter}")
 
+    # Per-iteration metrics
+    metrics = {
+        "iteration": list(range(1, iterations + 1)),
+        "dbwsa_avg_green": dbwsa_avg_green.tolist(),
+        "fixed_avg_green": fixed_avg_green.tolist(),
+        "improvement_percent": improvement.tolist()
+    }
+
     # Store overall summary and max metrics
     metrics["avg_dbwsa"] = avg_dbwsa
     metrics["avg_fixed"] = avg_fixed
@@ -1,18 +1,28 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
 from pathlib import Path
+from typing import Literal, Optional
 
 
 class YoloModelConfig(BaseSettings):
-    yolo_model_path: Path = Field(..., description="Path to pretrained YOLO model")
+    yolo_model_path: Path = Field(..., description="Path to pretrained YOLO model (.pt, .engine or .onnx)")
+    imgsz: int = Field(640, gt=0, description="Inference image size")
+    export_format: Literal["engine", "onnx"] = Field("engine", description="Format used by src.export_model")
 
 
 class DetectionConfig(BaseSettings):
-    input_traffic_video_path: Path = Field(..., description="Path to input traffic video file")
+    input_traffic_video_path: Path = Field(..., description="Path to input traffic video file, or a folder of videos")
     output_folder_name: Path = Field(..., description="Folder to save output")
-    mask_image_path: Path = Field(..., description="Path to mask image file")
+    mask_image_path: Path = Field(..., description="Path to mask image file, or a folder of <video name>_mask.jpg masks")
     confirmation_frame: int = Field(20, description="Frames to confirm detection")
     confidence_threshold: float = Field(0.35, description="Confidence threshold")
+    batch_size: int = Field(8, gt=0, description="Frames per YOLO inference batch")
+    save_detections: bool = Field(False, description="Stream per-detection data to a JSON Lines file")
+    frame_stride: int = Field(2, gt=0, description="Run detection and tracking on every n-th frame")
+    compile_model: bool = Field(False, description="Compile the YOLO network with torch.compile (CUDA only)")
+    target_fps: Optional[float] = Field(None, gt=0, description="Drop frames above this frame rate (all frames if unset)")
+    draw: bool = Field(True, description="Write the annotated output video (counts only if disabled)")
+    num_workers: int = Field(1, gt=0, description="Worker processes for a folder of videos, spread over the GPUs")
     yolo_model: YoloModelConfig
 
 
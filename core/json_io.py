@@ -0,0 +1,58 @@
+import json
+import numpy as np
+from pathlib import Path
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library
+    orjson = None
+
+# orjson serializes NumPy arrays natively, without going through Python lists
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY if orjson is not None else 0
+
+
+def _numpy_default(obj: Any) -> Any:
+    """
+    Convert NumPy arrays and scalars for the standard library encoder.
+    """
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def load_json(path: Union[str, Path]) -> Any:
+    """
+    Read and parse a JSON file.
+    """
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def dump_json(data: Any, path: Union[str, Path], indent: bool = True) -> None:
+    """
+    Write data to a JSON file, indented by 2 spaces if `indent` is set.
+    NumPy arrays and scalars are written as JSON arrays and numbers.
+    """
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)))
+        return
+
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2 if indent else None, default=_numpy_default)
+
+
+def dumps_line(data: Any) -> bytes:
+    """
+    Serialize data as a single newline terminated JSON Lines record.
+    NumPy arrays and scalars are written as JSON arrays and numbers.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+
+    return (json.dumps(data, default=_numpy_default) + "\n").encode()
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional, Tuple
 from pydantic import BaseModel, Field
 
 
@@ -9,10 +9,8 @@ class DetectionItem(BaseModel):
     """
     tracker_id: int = Field(..., description="Unique identifier assigned by the tracker")
     confidence: float = Field(..., ge=0.0, le=1.0, description="Detection confidence score between 0 and 1")
-    coords: List[int] = Field(
+    coords: Tuple[int, int, int, int] = Field(
         ...,
-        min_items=4,
-        max_items=4,
         description="Bounding box coordinates in the format [x1, y1, x2, y2]"
     )
 
@@ -43,8 +41,8 @@ class VehicleCounts(BaseModel):
 class VehicleDetectionResponse(BaseModel):
     """
     Main response model for vehicle detection.
-    Includes total count, per-class counts, and detailed detection data.
+    Includes total count, per-class counts, and optionally detailed detection data.
     """
     total_vehicles: int = Field(..., ge=0, description="Total number of confirmed vehicles detected")
     vehicle_counts: VehicleCounts = Field(..., description="Confirmed vehicle counts by type")
-    detection_data: DetectionData = Field(..., description="Detailed detection results grouped by vehicle class")
\ No newline at end of file
+    detection_data: Optional[DetectionData] = Field(None, description="Detailed detection results grouped by vehicle class")
\ No newline at end of file
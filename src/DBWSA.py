@@ -8,13 +8,17 @@ Traffic intersection data must conform to the schema defined in:
     from schema.intersections import IntersectionData
 """
 
-import json
 import yaml 
 from typing import Dict, Any
 from core.config import TrafficSignalAllocatorConfig
+from core.json_io import load_json
 from schema.intersections import IntersectionData
 
 
+# Fixed vehicle type order, e.g. for array shaped traffic samples in the benchmark
+VEHICLE_TYPES = ("bicycle", "motorcycle", "car", "bus", "truck")
+
+
 class TrafficSignalAllocator:
     def __init__(self, base_green_time: int = 5, max_green_time: int = 60, yellow_time: int = 3, total_cycle_time: int = 60):
         """
@@ -82,29 +86,30 @@ class TrafficSignalAllocator:
         if "intersection" not in traffic_data:
             raise ValueError("Invalid JSON format: 'intersection' key missing. Ensure input matches IntersectionData schema.")
 
-        road_densities = {}
-        for road, data in traffic_data["intersection"].items():
-            total_vehicles = data["total_vehicles"]
-            road_length = data["road_length"]
-            road_densities[road] = self.calculate_traffic_density(total_vehicles, road_length)
+        # Attribute lookups hoisted out of the per-road loops
+        traffic_density = self.calculate_traffic_density
+        base_green_time, max_green_time = self.base_green_time, self.max_green_time
+        yellow_time, total_cycle_time = self.yellow_time, self.total_cycle_time
 
+        road_densities = {
+            road: traffic_density(data["total_vehicles"], data["road_length"])
+            for road, data in traffic_data["intersection"].items()
+        }
         total_density = sum(road_densities.values())
 
-        green_times = {}
+        # Green, yellow and red times in a single pass
+        signal_times = {}
         for road, density in road_densities.items():
             if total_density == 0:
-                green_times[road] = self.base_green_time
+                green_time = base_green_time
             else:
-                proportional_time = (density / total_density) * self.max_green_time
-                green_times[road] = round(min(max(self.base_green_time, proportional_time), self.max_green_time))
+                proportional_time = (density / total_density) * max_green_time
+                green_time = round(min(max(base_green_time, proportional_time), max_green_time))
 
-        signal_times = {}
-        for road, green_time in green_times.items():
-            red_time = self.total_cycle_time - (green_time + self.yellow_time)
             signal_times[road] = {
                 "Green": green_time,
-                "Yellow": self.yellow_time,
-                "Red": red_time
+                "Yellow": yellow_time,
+                "Red": total_cycle_time - (green_time + yellow_time)
             }
 
         return signal_times
@@ -125,8 +130,7 @@ if __name__ == "__main__":
     )
 
     # Load and validate traffic intersection data
-    with open(str(traffic_signal_allocator_config.traffic_intersection_data_path), "r") as file:
-        traffic_data = json.load(file)
+    traffic_data = load_json(traffic_signal_allocator_config.traffic_intersection_data_path)
 
     try:
         # Must conform to the schema defined in schema/intersections.py
@@ -0,0 +1,51 @@
+import yaml
+import torch
+from typing import Optional
+from ultralytics import YOLO
+from core.config import DetectionConfig
+
+
+def export_yolo_model(model_path: str,
+                      export_format: str = "engine",
+                      imgsz: int = 640,
+                      batch_size: int = 8,
+                      half: Optional[bool] = None) -> str:
+    """
+    Export a YOLO model ahead of time to TensorRT (.engine) or ONNX (.onnx).
+
+    The exported model is built with a dynamic batch dimension of up to `batch_size`,
+    so the detector can run full batches as well as the shorter last batch of a video.
+
+    Args:
+        model_path (str): Path to the YOLO model (.pt file).
+        export_format (str): "engine" for TensorRT or "onnx" for ONNX Runtime.
+        imgsz (int): Inference image size the model is exported for.
+        batch_size (int): Maximum number of frames per inference call.
+        half (bool): Export with FP16 precision (default: only when CUDA is available,
+            Ultralytics does not export FP16 models on the CPU).
+
+    Returns:
+        str: Path of the exported model, usable as `yolo_model_path`.
+    """
+    if half is None:
+        half = torch.cuda.is_available()
+
+    model = YOLO(model_path)
+    return model.export(format=export_format, imgsz=imgsz, half=half, dynamic=True, batch=batch_size)
+
+
+if __name__ == "__main__":
+    with open("config.yaml", "r") as f:
+        data = yaml.safe_load(f)
+
+    detection_config = DetectionConfig(**data['detection'])
+
+    exported_path = export_yolo_model(
+        model_path=str(detection_config.yolo_model.yolo_model_path),
+        export_format=detection_config.yolo_model.export_format,
+        imgsz=detection_config.yolo_model.imgsz,
+        batch_size=detection_config.batch_size
+    )
+
+    print(f"Exported model saved to {exported_path}")
+    print("Set yolo_model_path in config.yaml to this file to use it for detection.")
@@ -4,6 +4,7 @@ import tkinter as tk
 from tkinter import filedialog, Canvas, Button
 from PIL import Image, ImageTk
 import os
+import time
 
 # Constants for fixed resolution
 CANVAS_WIDTH = 1280
@@ -18,6 +19,8 @@ drawing = False
 curve_points = []
 playing = False
 cap = None
+frame_interval = 1 / 30  # Seconds between frames, updated from the video FPS
+next_tick = 0.0
 output_folder = "masks"
 
 # Ensure output folder exists
@@ -34,7 +37,7 @@ def load_videos():
 
 # Function to load video by index
 def load_video_by_index(index):
-    global frame, tk_img, curve_points, current_video_index, cap
+    global frame, tk_img, curve_points, current_video_index, cap, frame_interval
     if index < 0 or index >= len(video_paths):
         return  
     
@@ -43,12 +46,14 @@ def load_video_by_index(index):
         cap.release()
     
     cap = cv2.VideoCapture(video_paths[current_video_index])
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_interval = 1 / fps if fps > 0 else 1 / 30
     read_frame()
     curve_points = []
 
 # Function to read a frame and update canvas
 def read_frame():
-    global cap, frame, tk_img, playing
+    global cap, frame, tk_img, playing, next_tick
     if not cap:
         return
     
@@ -59,7 +64,11 @@ def read_frame():
         display_frame(frame)
     
     if playing:
-        root.after(30, read_frame)  # Call function again to continue playing
+        # Schedule against a monotonic clock so decode time doesn't add up as drift;
+        # if we fell behind, restart the schedule instead of firing a burst of frames
+        now = time.perf_counter()
+        next_tick = max(next_tick + frame_interval, now)
+        root.after(int((next_tick - now) * 1000), read_frame)  # Call function again to continue playing
 
 # Function to resize frame while maintaining aspect ratio
 def resize_frame(image, width, height):
@@ -85,10 +94,11 @@ def display_frame(image):
 
 # Function to toggle play/pause
 def toggle_play():
-    global playing
+    global playing, next_tick
     playing = not playing
     if playing:
         btn_play.config(text="⏸")
+        next_tick = time.perf_counter()
         read_frame()
     else:
         btn_play.config(text="▶️")
@@ -1,13 +1,17 @@
 import cv2
-from ultralytics import YOLO
+import torch
 import yaml
 from pathlib import Path
 from core.config import DetectionConfig
+from src.yolo_model import configure_torch_runtime, load_yolo_model, warmup_yolo_model
+from src.video_io import ThreadedVideoWriter, batch_frames, create_video_reader, create_video_writer
 
 def annotate_video_with_yolo(video_path: Path, 
                              output_path: Path,
                              model_path: Path, 
-                             conf=0.25):
+                             conf=0.25,
+                             batch_size=8,
+                             imgsz=640):
     """
     Run predictions on a video using YOLO and save the output video with predictions.
 
@@ -16,12 +20,16 @@ def annotate_video_with_yolo(video_path: Path,
         output_path (str): Path to save the output video with predictions.
         model_path (str): Path to the YOLO model (.pt file).
         conf (float): Confidence threshold for predictions (default: 0.25).
+        batch_size (int): Number of frames per YOLO inference call (default: 8).
+        imgsz (int): Inference image size (default: 640).
     """
-    # Load the YOLO model
-    model = YOLO(model_path)
+    # Load the YOLO model (FP16 inference on GPU)
+    configure_torch_runtime()
+    model = load_yolo_model(model_path)
+    half = torch.cuda.is_available()
 
     # Open the video file
-    video = cv2.VideoCapture(video_path)
+    video = cv2.VideoCapture(str(video_path), cv2.CAP_FFMPEG)
     if not video.isOpened():
         print(f"Error: Could not open video {video_path}")
         return
@@ -30,29 +38,34 @@ def annotate_video_with_yolo(video_path: Path,
     fps = int(video.get(cv2.CAP_PROP_FPS))
     width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Codec for output video
 
-    # Initialize the video writer
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    # Set up the predictor before the first frame
+    warmup_yolo_model(model, (height, width, 3), batch_size=batch_size, imgsz=imgsz, conf=conf, half=half)
 
-    # Process video frame by frame
-    while True:
-        ret, frame = video.read()
-        if not ret:
-            break  # End of video
+    # Decoding and encoding run on background threads, overlapping with inference
+    cv2.setNumThreads(1)
+    reader = create_video_reader(video_path, video)
 
-        # Run prediction on the frame
-        results = model.predict(source=frame, conf=conf, save=False, show=False)
+    # Initialize the video writer (hardware accelerated H.264 when available)
+    out = ThreadedVideoWriter(create_video_writer(output_path, fps, (width, height)))
 
-        # Overlay predictions on the frame
-        annotated_frame = results[0].plot()  # Automatically draws boxes and labels
+    try:
+        # Process video in batches of frames
+        for frames in batch_frames(reader, batch_size):
+            # Run prediction on the whole batch in one call
+            results_list = model.predict(source=frames, imgsz=imgsz, conf=conf, half=half, save=False, show=False, verbose=False)
 
-        # Write the annotated frame to the output video
-        out.write(annotated_frame)
+            for results in results_list:
+                # Overlay predictions on the frame
+                annotated_frame = results.plot()  # Automatically draws boxes and labels
 
-    # Release resources
-    video.release()
-    out.release()
+                # Write the annotated frame to the output video
+                out.write(annotated_frame)
+    finally:
+        # Release resources, also when inference fails
+        reader.close()
+        video.release()
+        out.release()
     print(f"Prediction completed. Output saved to {output_path}")
 
 
@@ -66,12 +79,14 @@ if __name__ == "__main__":
     input_path = detection_config.input_traffic_video_path
     input_stem = input_path.stem  # e.g., 'test-video'
 
-    # Construct dynamic output file name: e.g., 'test-video-output.avi'
-    output_file_name = f"{input_stem}-output.avi"
+    # Construct dynamic output file name: e.g., 'test-video-output.mp4'
+    output_file_name = f"{input_stem}-output.mp4"
     output_path = detection_config.output_folder_name / Path(output_file_name)
 
     # Get model path
     model_path = detection_config.yolo_model.yolo_model_path
 
     # Run annotation function
-    annotate_video_with_yolo(input_path, output_path, model_path)
\ No newline at end of file
+    annotate_video_with_yolo(input_path, output_path, model_path,
+                             batch_size=detection_config.batch_size,
+                             imgsz=detection_config.yolo_model.imgsz)
\ No newline at end of file
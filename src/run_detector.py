@@ -1,11 +1,68 @@
 import cv2
 import yaml
 import os
+import math
+import multiprocessing
+import torch
+import numpy as np
 import supervision as sv
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from ultralytics import YOLO
-from collections import defaultdict, deque
+from collections import Counter, defaultdict, deque
 from schema.detections import VehicleDetectionResponse
 from core.config import DetectionConfig
+from core.json_io import dump_json, dumps_line
+from src.yolo_model import configure_torch_runtime, load_yolo_model, set_input_mask, warmup_yolo_model
+from src.video_io import ThreadedVideoWriter, batch_frames, create_video_reader, create_video_writer
+
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov")
+
+_worker_model = None  # YOLO model of a worker process, loaded once by _init_worker
+
+def get_mask_roi(binary_mask: np.ndarray, stride: int = 32) -> Tuple[int, int, int, int]:
+    """
+    Bounding box (x0, y0, x1, y1) of the white area of the mask, grown to a multiple
+    of the YOLO stride and clamped to the frame. An empty mask yields the full frame.
+    """
+    height, width = binary_mask.shape[:2]
+    ys, xs = np.nonzero(binary_mask)
+    if xs.size == 0:
+        return 0, 0, width, height
+
+    x0, x1 = int(xs.min()), int(xs.max()) + 1
+    y0, y1 = int(ys.min()), int(ys.max()) + 1
+
+    roi_width = min(width, -(-(x1 - x0) // stride) * stride)
+    roi_height = min(height, -(-(y1 - y0) // stride) * stride)
+    x0 = min(x0, width - roi_width)
+    y0 = min(y0, height - roi_height)
+
+    return x0, y0, x0 + roi_width, y0 + roi_height
+
+
+def render_counts_hud(counts: Dict[str, int], total: int, width: int = 200, height: int = 200) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Render the confirmed vehicle counts onto a black patch for the top right corner of the frame.
+    Returns the patch and a boolean mask of its text pixels, so it can be copied onto frames
+    without covering the video behind it.
+    """
+    hud = np.zeros((height, width, 3), dtype=np.uint8)
+
+    y_offset = 30
+    text_color = (0, 255, 0)
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    font_scale = 0.8
+    thickness = 2
+
+    cv2.putText(hud, f"Total: {total}", (0, y_offset), font, font_scale, text_color, thickness)
+
+    for cls, count in counts.items():
+        y_offset += 30
+        cv2.putText(hud, f"{cls.capitalize()}: {count}", (0, y_offset), font, font_scale, text_color, thickness)
+
+    return hud, hud.any(axis=2, keepdims=True)
 
 
 def analyze_traffic_video(
@@ -14,21 +71,39 @@ def analyze_traffic_video(
                         output_folder: str, 
                         mask_image_path: str, 
                         confirmation_frame: int, 
-                        confidence_threshold: float) -> VehicleDetectionResponse:
+                        confidence_threshold: float,
+                        batch_size: int = 8,
+                        save_detections: bool = False,
+                        frame_stride: int = 2,
+                        compile_model: bool = False,
+                        target_fps: Optional[float] = None,
+                        imgsz: int = 640,
+                        draw: bool = True,
+                        model: Optional[YOLO] = None,
+                        num_workers: int = 1) -> VehicleDetectionResponse:
     
     video_name = os.path.splitext(os.path.basename(input_video_path))[0]
     video_output_folder = os.path.join(output_folder, video_name)
     os.makedirs(video_output_folder, exist_ok=True)
+
+    # Decode / encode run on their own threads; keep OpenCV and PyTorch from oversubscribing the cores
+    cv2.setNumThreads(1)
+    configure_torch_runtime(num_workers)  # Videos processed in parallel share the CPU cores
     
-    output_video_path = os.path.join(video_output_folder, f"{video_name}.avi")
+    output_video_path = os.path.join(video_output_folder, f"{video_name}.mp4")
     json_output_path = os.path.join(video_output_folder, f"{video_name}_traffic_data.json")
+    detections_output_path = os.path.join(video_output_folder, f"{video_name}_detections.jsonl")
 
-    cap = cv2.VideoCapture(input_video_path)
+    cap = cv2.VideoCapture(input_video_path, cv2.CAP_FFMPEG)  # Explicit FFmpeg demuxer / decoder
     
     frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = int(cap.get(cv2.CAP_PROP_FPS))
 
+    # Frames above `target_fps` are dropped by the reader and left out of the output video
+    fps_stride = max(1, int(fps / target_fps)) if target_fps else 1
+    processed_stride = fps_stride * frame_stride  # Source frames per detection/tracking step
+
     mask = cv2.imread(mask_image_path, cv2.IMREAD_GRAYSCALE)
     if mask is None:
         raise FileNotFoundError(f"Error: Could not read the mask image at {mask_image_path}")
@@ -36,99 +111,194 @@ def analyze_traffic_video(
     mask = cv2.resize(mask, (frame_width, frame_height))  
     _, binary_mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
 
-    fourcc = cv2.VideoWriter_fourcc(*"XVID")
-    out = cv2.VideoWriter(output_video_path, fourcc, fps, (frame_width, frame_height))
+    # Only the masked region of interest is fed to YOLO
+    roi_x0, roi_y0, roi_x1, roi_y1 = get_mask_roi(binary_mask)
+    roi_mask = binary_mask[roi_y0:roi_y1, roi_x0:roi_x1]
+    roi_offset = np.array([roi_x0, roi_y0, roi_x0, roi_y0], dtype=np.float32)
+
+    if model is None:
+        model = load_yolo_model(yolo_model_path)
+    elif model.predictor is not None:
+        set_input_mask(model, None)  # Model reused across videos: drop the previous video's mask
+    half = torch.cuda.is_available()  # FP16 inference on GPU
+    predict_kwargs = dict(imgsz=imgsz, conf=confidence_threshold, half=half)  # YOLO applies the confidence threshold
+    warmup_yolo_model(model, roi_mask.shape + (3,), batch_size=batch_size, compile_model=compile_model, **predict_kwargs)
+
+    # No masking needed if the ROI is fully white. On GPU the mask is applied to the preprocessed
+    # batch; on CPU masked ROIs are written into reusable buffers.
+    apply_mask = not np.all(roi_mask)
+    if apply_mask and torch.cuda.is_available():
+        set_input_mask(model, roi_mask)
+        apply_mask = False
+    masked_buffers = np.empty((batch_size, roi_y1 - roi_y0, roi_x1 - roi_x0, 3), dtype=np.uint8) if apply_mask else None
 
-    model = YOLO(yolo_model_path) 
-    tracker = sv.ByteTrack()
+    # YOLO and ByteTrack only run on every `frame_stride`-th frame
+    tracker = sv.ByteTrack(frame_rate=max(1, round(fps / processed_stride)))
 
     VEHICLE_CLASSES =  ['bicycle', 'car', 'bus', 'truck', 'motorcycle']
+    # Class id -> name lookup table and the ids of the classes counted as vehicles
+    class_names = np.array([model.names[i] for i in range(len(model.names))], dtype=object)
+    vehicle_class_ids = np.flatnonzero(np.isin(class_names, VEHICLE_CLASSES))
     box_annotator = sv.BoxAnnotator()
     label_annotator = sv.LabelAnnotator()
 
-    vehicle_data = {}
-    vehicle_counts = {cls: set() for cls in VEHICLE_CLASSES}  
-    confirmed_counts = {cls: set() for cls in VEHICLE_CLASSES}  
-    detection_history = defaultdict(lambda: deque(maxlen=confirmation_frame))
+    hud_width, hud_height = min(200, frame_width), min(200, frame_height)
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
+    def annotate_frame(frame, detections, labels, hud, hud_mask):
+        frame = box_annotator.annotate(scene=frame, detections=detections)
+        frame = label_annotator.annotate(scene=frame, detections=detections, labels=labels)
+        np.copyto(frame[:hud_height, frame_width - hud_width:], hud, where=hud_mask)
+        return frame
 
-        masked_frame = cv2.bitwise_and(frame, frame, mask=binary_mask)
-        results = model(masked_frame)[0]
-        detections = sv.Detections.from_ultralytics(results)
+    # Annotation and encoding run on the writer thread; without drawing no video is written
+    out = ThreadedVideoWriter(create_video_writer(output_video_path, fps / fps_stride, (frame_width, frame_height)),
+                              annotate=annotate_frame) if draw else None
 
-        detections = detections[detections.confidence > confidence_threshold]
-        detections = tracker.update_with_detections(detections)
+    # Vehicle detections are streamed to a JSON Lines file instead of being kept in memory
+    detections_file = open(detections_output_path, "wb") if save_detections else None
+    frame_index = 0
 
-        labels = [
-            f"{model.names[int(cls)]} {conf:.2f} (ID: {tracker_id})"
-            for cls, conf, tracker_id in zip(detections.class_id, detections.confidence, detections.tracker_id)
-        ]
+    confirmed_counts = {cls: 0 for cls in VEHICLE_CLASSES}
+    confirmed_vehicles = set()  # (tracker_id, label) pairs already counted
+    total_confirmed_vehicles = 0
+    history_length = max(1, math.ceil(confirmation_frame / processed_stride))  # Confirmation window in processed frames
+    detection_history = defaultdict(lambda: deque(maxlen=history_length))
+    label_counters = defaultdict(Counter)  # Running label counts of each detection_history deque
 
-        frame = box_annotator.annotate(scene=frame, detections=detections)
-        frame = label_annotator.annotate(scene=frame, detections=detections, labels=labels)
+    reader = create_video_reader(input_video_path, cap, stride=fps_stride)
+    hud, hud_mask = render_counts_hud(confirmed_counts, total_confirmed_vehicles, hud_width, hud_height)
+    hud_total = total_confirmed_vehicles
+    detections = sv.Detections.empty()
+    labels = []
 
-        for box, cls, conf, tracker_id in zip(detections.xyxy, detections.class_id, detections.confidence, detections.tracker_id):
-            label = model.names[int(cls)]
-            if label in VEHICLE_CLASSES and tracker_id is not None:
-                x1, y1, x2, y2 = map(int, box)
-                
-                if label not in vehicle_data:
-                    vehicle_data[label] = []
+    # Decoding / encoding threads, the ffmpeg process and the detections file are closed even if inference fails
+    try:
+        # Every chunk holds `batch_size` frames to run inference on plus the skipped frames in between
+        for frames in batch_frames(reader, batch_size * frame_stride):
+            rois = [frame[roi_y0:roi_y1, roi_x0:roi_x1] for frame in frames[::frame_stride]]
+            if apply_mask:
+                masked_frames = [cv2.bitwise_and(roi, roi, mask=roi_mask, dst=masked_buffers[i]) for i, roi in enumerate(rois)]
+            else:
+                masked_frames = rois
+            results_iter = iter(model(masked_frames, verbose=False, **predict_kwargs))
 
-                vehicle_data[label].append({
-                    "tracker_id": int(tracker_id),
-                    "confidence": float(conf),
-                    "coords": [x1, y1, x2, y2]
-                })
+            # ByteTrack must see the frames in order, one at a time
+            for i, frame in enumerate(frames):
+                # Skipped frames are drawn with the detections of the last processed frame
+                if i % frame_stride == 0:
+                    results = next(results_iter)
+                    detections = sv.Detections.from_ultralytics(results)
+                    detections.xyxy += roi_offset  # ROI -> full frame coordinates
+                    detections = tracker.update_with_detections(detections)
 
-                detection_history[tracker_id].append(label)
+                    class_ids = detections.class_id.astype(np.int32)
+                    label_names = class_names[class_ids]
 
-                if len(detection_history[tracker_id]) == confirmation_frame:
-                    most_common_label = max(set(detection_history[tracker_id]), key=detection_history[tracker_id].count)
-                    if most_common_label == label and tracker_id not in confirmed_counts[label]:
-                        confirmed_counts[label].add(tracker_id)
+                    if draw:
+                        conf_texts = np.char.mod("%.2f", detections.confidence)
+                        labels = [
+                            name + " " + conf + " (ID: " + str(tracker_id) + ")"
+                            for name, conf, tracker_id in zip(label_names, conf_texts, detections.tracker_id)
+                        ]
 
-        y_offset = 30  
-        text_color = (0, 255, 0)  
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        font_scale = 0.8
-        thickness = 2
+                    # Reduce all detection arrays to vehicles once, then work on plain Python values
+                    is_vehicle = np.isin(class_ids, vehicle_class_ids)
+                    vehicle_labels = label_names[is_vehicle].tolist()
+                    vehicle_tracker_ids = detections.tracker_id[is_vehicle].tolist()
 
-        total_confirmed_vehicles = sum(len(confirmed_counts[cls]) for cls in VEHICLE_CLASSES)
+                    # One record per frame with a parallel array per field
+                    if detections_file is not None and vehicle_labels:
+                        detections_file.write(dumps_line({
+                            "frame": frame_index,
+                            "label": vehicle_labels,
+                            "tracker_id": vehicle_tracker_ids,
+                            "confidence": detections.confidence[is_vehicle],
+                            "coords": detections.xyxy[is_vehicle].astype(np.int32)
+                        }))
 
-        cv2.putText(frame, f"Total: {total_confirmed_vehicles}", (frame_width - 200, y_offset), font, font_scale, text_color, thickness)
+                    for label, tracker_id in zip(vehicle_labels, vehicle_tracker_ids):
+                        history = detection_history[tracker_id]
+                        label_counter = label_counters[tracker_id]
+                        if len(history) == history_length:
+                            label_counter[history[0]] -= 1  # Evicted by the append below
+                        history.append(label)
+                        label_counter[label] += 1
 
-        for cls in VEHICLE_CLASSES:
-            y_offset += 30
-            count = len(confirmed_counts[cls])
-            cv2.putText(frame, f"{cls.capitalize()}: {count}", (frame_width - 200, y_offset), font, font_scale, text_color, thickness)
+                        if len(history) == history_length:
+                            most_common_label = label_counter.most_common(1)[0][0]
+                            if most_common_label == label and (tracker_id, label) not in confirmed_vehicles:
+                                confirmed_vehicles.add((tracker_id, label))
+                                confirmed_counts[label] += 1
+                                total_confirmed_vehicles += 1
 
-        out.write(frame)
+                if draw:
+                    # Counts only ever grow, so a changed total means the HUD needs re-rendering
+                    if total_confirmed_vehicles != hud_total:
+                        hud, hud_mask = render_counts_hud(confirmed_counts, total_confirmed_vehicles, hud_width, hud_height)
+                        hud_total = total_confirmed_vehicles
 
-    cap.release()
-    out.release()
+                    out.write(frame, detections, labels, hud, hud_mask)
+                frame_index += fps_stride
+    finally:
+        reader.close()
+        cap.release()
+        if out is not None:
+            out.release()
+        if detections_file is not None:
+            detections_file.close()
 
     final_output = {
         "total_vehicles": total_confirmed_vehicles,
-        "vehicle_counts": {cls: len(confirmed_counts[cls]) for cls in VEHICLE_CLASSES},
-        "detection_data": vehicle_data
+        "vehicle_counts": confirmed_counts
     }
 
     validated_response = VehicleDetectionResponse.model_validate(final_output)
     print("Validation successful")
 
-    with open(json_output_path, "w") as json_file:
-        json_file.write(validated_response.model_dump_json(indent=4))
+    dump_json(validated_response.model_dump(exclude_none=True), json_output_path)
 
-    print(f"Processed video saved in {video_output_folder}")
+    if draw:
+        print(f"Processed video saved in {video_output_folder}")
     print(f"Traffic data saved to {json_output_path}")
+    if save_detections:
+        print(f"Detection data saved to {detections_output_path}")
     print(f"Total confirmed vehicles detected: {total_confirmed_vehicles}")
     for cls in VEHICLE_CLASSES:
-        print(f"{cls.capitalize()}: {len(confirmed_counts[cls])}")
+        print(f"{cls.capitalize()}: {confirmed_counts[cls]}")
+
+    return validated_response
+
+
+def list_video_jobs(video_path: Path, mask_path: Path) -> List[Tuple[Path, Path]]:
+    """
+    Pair each input video with its mask. A folder of videos is matched against a folder
+    of masks named `<video name>_mask.jpg`, as written by src.generate_mask.
+    """
+    if video_path.is_dir():
+        video_paths = sorted(p for p in video_path.iterdir() if p.suffix.lower() in VIDEO_EXTENSIONS)
+    else:
+        video_paths = [video_path]
+
+    return [
+        (video, mask_path / f"{video.stem}_mask.jpg" if mask_path.is_dir() else mask_path)
+        for video in video_paths
+    ]
+
+
+def _init_worker(yolo_model_path: str, gpu_ids) -> None:
+    """
+    Pool initializer: pin the worker to its GPU and load the model it reuses for every video.
+    """
+    global _worker_model
+    gpu_id = gpu_ids.get()
+    if gpu_id is not None:
+        os.environ["CUDA_VISIBLE_DEVICES"] = str(gpu_id)  # Must be set before CUDA is initialized
+    _worker_model = load_yolo_model(yolo_model_path)
+
+
+def _analyze_video_worker(kwargs: dict) -> VehicleDetectionResponse:
+    return analyze_traffic_video(model=_worker_model, **kwargs)
+
 
 if __name__ == "__main__":
 
@@ -136,12 +306,37 @@ if __name__ == "__main__":
         data = yaml.safe_load(f)
         
     detection_config = DetectionConfig(**data['detection'])
-    
-    analyze_traffic_video(
+
+    common_kwargs = dict(
         yolo_model_path=str(detection_config.yolo_model.yolo_model_path),
-        input_video_path=str(detection_config.input_traffic_video_path),
         output_folder=str(detection_config.output_folder_name),
-        mask_image_path=str(detection_config.mask_image_path),
         confirmation_frame=detection_config.confirmation_frame,
-        confidence_threshold=detection_config.confidence_threshold
-    )
\ No newline at end of file
+        confidence_threshold=detection_config.confidence_threshold,
+        batch_size=detection_config.batch_size,
+        save_detections=detection_config.save_detections,
+        frame_stride=detection_config.frame_stride,
+        compile_model=detection_config.compile_model,
+        target_fps=detection_config.target_fps,
+        imgsz=detection_config.yolo_model.imgsz,
+        draw=detection_config.draw
+    )
+    jobs = [
+        dict(common_kwargs, input_video_path=str(video_path), mask_image_path=str(mask_path))
+        for video_path, mask_path in list_video_jobs(detection_config.input_traffic_video_path, detection_config.mask_image_path)
+    ]
+
+    num_workers = min(detection_config.num_workers, len(jobs))
+    if num_workers <= 1:
+        for job in jobs:
+            analyze_traffic_video(**job)
+    else:
+        # One process per worker sidesteps the GIL; workers are spread round-robin over the GPUs
+        num_gpus = torch.cuda.device_count()
+        context = multiprocessing.get_context("spawn")
+        gpu_ids = context.Queue()
+        for i in range(num_workers):
+            gpu_ids.put(i % num_gpus if num_gpus else None)
+        jobs = [dict(job, num_workers=num_workers) for job in jobs]
+
+        with context.Pool(num_workers, initializer=_init_worker, initargs=(common_kwargs["yolo_model_path"], gpu_ids)) as pool:
+            pool.map(_analyze_video_worker, jobs, chunksize=1)
@@ -0,0 +1,297 @@
+import cv2
+import queue
+import shutil
+import threading
+import subprocess
+import numpy as np
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    from torchcodec.decoders import VideoDecoder
+except (ImportError, RuntimeError):  # Optional, multi-threaded decoding; falls back to cv2.VideoCapture
+    # RuntimeError: torchcodec is installed but cannot load its FFmpeg libraries or torch build
+    VideoDecoder = None
+
+# Hardware H.264 encoders tried in order when an ffmpeg executable is available
+FFMPEG_HW_ENCODERS = ("h264_nvenc", "h264_qsv")
+
+
+class FFmpegVideoWriter:
+    """
+    Pipes raw BGR frames into an `ffmpeg` subprocess, so encoding runs on a hardware
+    encoder (NVENC, Quick Sync) that OpenCV's own FFmpeg build may not expose.
+    Mirrors the write/release/isOpened interface of cv2.VideoWriter.
+    """
+    def __init__(self, output_path: str, fps: float, frame_size: Tuple[int, int], encoder: str = "h264_nvenc"):
+        width, height = frame_size
+        command = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+            "-c:v", encoder, "-pix_fmt", "yuv420p",
+        ]
+        if encoder == "h264_nvenc":
+            command += ["-preset", "p1"]  # Fastest NVENC preset
+        self.output_path = str(output_path)
+        command.append(self.output_path)
+        self.proc = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def isOpened(self) -> bool:
+        return self.proc.poll() is None
+
+    def write(self, frame: np.ndarray):
+        self.proc.stdin.write(np.ascontiguousarray(frame).data)
+
+    def release(self):
+        """
+        Close the pipe and wait for ffmpeg to finish writing the file.
+        Raises RuntimeError if ffmpeg failed.
+        """
+        if self.proc.stdin and not self.proc.stdin.closed:
+            try:
+                self.proc.stdin.close()
+            except BrokenPipeError:
+                pass  # ffmpeg already exited; reported through its exit code below
+        returncode = self.proc.wait()
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with code {returncode} while writing {self.output_path}")
+
+
+@lru_cache(maxsize=None)
+def find_ffmpeg_hw_encoder() -> Optional[str]:
+    """
+    Return the first of FFMPEG_HW_ENCODERS that the `ffmpeg` executable can actually
+    encode with on this machine, or None if there is no ffmpeg or no usable encoder.
+    """
+    if shutil.which("ffmpeg") is None:
+        return None
+
+    for encoder in FFMPEG_HW_ENCODERS:
+        # Encoding a single blank frame fails fast if the encoder or its device is missing
+        probe = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "lavfi", "-i", "color=size=256x256",
+             "-frames:v", "1", "-c:v", encoder, "-f", "null", "-"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        if probe.returncode == 0:
+            return encoder
+    return None
+
+
+def create_video_writer(output_path: str, fps: float, frame_size: Tuple[int, int]) -> Union[FFmpegVideoWriter, cv2.VideoWriter]:
+    """
+    Open an MP4 video writer, preferring hardware accelerated H.264 encoding.
+
+    Uses an `ffmpeg` subprocess when it has a working hardware encoder, then OpenCV's
+    FFmpeg backend with H.264 and hardware acceleration (whichever the OpenCV build
+    supports), and finally the software MPEG-4 (mp4v) encoder.
+
+    Args:
+        output_path (str): Path of the output video file (.mp4).
+        fps (float): Frame rate of the output video.
+        frame_size (tuple): (width, height) of the frames.
+
+    Returns:
+        FFmpegVideoWriter | cv2.VideoWriter: An opened video writer.
+    """
+    encoder = find_ffmpeg_hw_encoder()
+    if encoder is not None:
+        return FFmpegVideoWriter(output_path, fps, frame_size, encoder)
+
+    writer = cv2.VideoWriter(
+        str(output_path), cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*"avc1"), fps, frame_size,
+        [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+    )
+    if writer.isOpened():
+        return writer
+
+    writer.release()
+    return cv2.VideoWriter(str(output_path), cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*"mp4v"), fps, frame_size)
+
+
+def batch_frames(frames: Iterable[np.ndarray], batch_size: int) -> Iterator[List[np.ndarray]]:
+    """
+    Group consecutive frames into lists of up to `batch_size` frames.
+    The last batch may be shorter.
+    """
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ThreadedVideoReader:
+    """
+    Decodes frames from a cv2.VideoCapture on a background thread into a bounded queue,
+    so decoding overlaps with inference. Iterating the reader yields frames in order and
+    re-raises a decoding error instead of ending the stream early.
+
+    With `stride` > 1 only every `stride`-th frame is yielded. The frames in between are
+    only grabbed, which still decodes them but skips the color conversion and copy.
+    """
+    def __init__(self, cap: cv2.VideoCapture, queue_size: int = 8, stride: int = 1):
+        self.cap = cap
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Frames are buffered in our queue instead
+        self._start(queue_size, stride)
+
+    def _start(self, queue_size: int, stride: int):
+        self.stride = stride
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.error = None  # Exception raised while decoding, re-raised to the consumer
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def _read(self):
+        try:
+            self._decode()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.frames.put(None)  # End of stream
+
+    def _decode(self):
+        index = 0
+        while not self.stopped.is_set():
+            if not self.cap.grab():
+                break
+            if index % self.stride == 0:
+                ret, frame = self.cap.retrieve()
+                if not ret:
+                    break
+                self.frames.put(frame)
+            index += 1
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield frame
+
+    def close(self):
+        """
+        Stop decoding and wait for the reader thread to exit.
+        """
+        self.stopped.set()
+        while self.thread.is_alive():
+            try:
+                self.frames.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self.thread.join()
+
+
+class TorchCodecVideoReader(ThreadedVideoReader):
+    """
+    ThreadedVideoReader backed by torchcodec's multi-threaded FFmpeg decoder instead of
+    cv2.VideoCapture. Frames are decoded `chunk_size` at a time and yielded as BGR arrays.
+    """
+    def __init__(self, video_path: str, queue_size: int = 8, stride: int = 1,
+                 num_threads: int = 0, chunk_size: int = 8):
+        # num_ffmpeg_threads=0 lets FFmpeg pick the thread count
+        self.decoder = VideoDecoder(str(video_path), num_ffmpeg_threads=num_threads, dimension_order="NHWC")
+        self.chunk_size = chunk_size
+        self._start(queue_size, stride)
+
+    def _decode(self):
+        num_frames = len(self.decoder)
+        chunk_span = self.chunk_size * self.stride
+        for start in range(0, num_frames, chunk_span):
+            if self.stopped.is_set():
+                break
+            chunk = self.decoder.get_frames_in_range(start, min(start + chunk_span, num_frames), self.stride)
+            for frame in chunk.data.numpy():
+                self.frames.put(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+
+
+def create_video_reader(video_path: str, cap: cv2.VideoCapture, queue_size: int = 8, stride: int = 1) -> ThreadedVideoReader:
+    """
+    Open a threaded frame reader, decoding with torchcodec when it is installed and can
+    open the video, and with the already opened `cap` otherwise.
+
+    Args:
+        video_path (str): Path of the input video file.
+        cap (cv2.VideoCapture): Capture opened on `video_path`, used without torchcodec.
+        queue_size (int): Maximum number of decoded frames buffered ahead.
+        stride (int): Only yield every `stride`-th frame.
+
+    Returns:
+        ThreadedVideoReader: A reader yielding BGR frames in order.
+    """
+    if VideoDecoder is not None:
+        try:
+            return TorchCodecVideoReader(video_path, queue_size=queue_size, stride=stride)
+        except Exception as e:
+            print(f"torchcodec could not open {video_path} ({e}), decoding with OpenCV")
+    return ThreadedVideoReader(cap, queue_size=queue_size, stride=stride)
+
+
+class ThreadedVideoWriter:
+    """
+    Encodes frames on a background thread, so encoding overlaps with inference.
+    Mirrors the write/release interface of cv2.VideoWriter. Frames must not be
+    modified after they are passed to `write`.
+
+    An optional `annotate(frame, *args)` callable is applied on the writer thread
+    before encoding, with the extra arguments passed to `write`. If annotating or
+    encoding fails, the thread stops and the error is re-raised by `write` / `release`.
+    """
+    def __init__(self, writer: cv2.VideoWriter, queue_size: int = 8,
+                 annotate: Optional[Callable[..., np.ndarray]] = None):
+        self.writer = writer
+        self.annotate = annotate
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.error = None  # Exception raised on the writer thread
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+
+    def _write(self):
+        try:
+            while True:
+                item = self.frames.get()
+                if item is None:
+                    break
+                frame, args = item
+                if self.annotate is not None:
+                    frame = self.annotate(frame, *args)
+                self.writer.write(frame)
+        except Exception as e:
+            self.error = e  # Stop consuming; the queue is no longer drained
+
+    def _put(self, item):
+        # Never block forever on a full queue once the writer thread has failed
+        while self.error is None:
+            try:
+                self.frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise self.error
+
+    def write(self, frame: np.ndarray, *args):
+        self._put((frame, args))
+
+    def release(self):
+        """
+        Flush the remaining frames and release the underlying writer.
+        Re-raises an error from the writer thread.
+        """
+        try:
+            if self.error is None:
+                self._put(None)
+                self.thread.join()
+        finally:
+            try:
+                self.writer.release()
+            except Exception:
+                if self.error is None:
+                    raise  # Otherwise the writer thread's error is the one to report
+        if self.error is not None:
+            raise self.error
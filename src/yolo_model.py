@@ -0,0 +1,112 @@
+import os
+import torch
+import numpy as np
+from pathlib import Path
+from ultralytics import YOLO
+from typing import Optional, Tuple
+
+
+# Ahead-of-time exported formats (see src/export_model.py), loaded through their own runtimes
+EXPORTED_MODEL_SUFFIXES = (".engine", ".onnx")
+
+
+def configure_torch_runtime(num_processes: int = 1) -> None:
+    """
+    Leave half of the CPU cores to PyTorch's intra-op pools, the rest go to the video
+    decode / encode threads, and let cuDNN benchmark kernels for the fixed input shape.
+    With `num_processes` worker processes each one gets its share of that half.
+    """
+    torch.set_num_threads(max(1, (os.cpu_count() or 2) // (2 * num_processes)))
+    torch.backends.cudnn.benchmark = True
+
+
+def load_yolo_model(model_path: str) -> YOLO:
+    """
+    Load a YOLO model for inference.
+
+    PyTorch models get their Conv and BatchNorm layers fused. TensorRT (.engine) and
+    ONNX (.onnx) exports are run by TensorRT / ONNX Runtime, which do their own fusion.
+
+    Args:
+        model_path (str): Path to the YOLO model (.pt, .engine or .onnx file).
+
+    Returns:
+        YOLO: The loaded model.
+    """
+    model = YOLO(model_path, task="detect")
+    if Path(model_path).suffix not in EXPORTED_MODEL_SUFFIXES:
+        model.fuse()
+    return model
+
+
+def warmup_yolo_model(model: YOLO,
+                      frame_shape: Tuple[int, int, int],
+                      batch_size: int = 1,
+                      runs: int = 3,
+                      compile_model: bool = False,
+                      **predict_kwargs) -> None:
+    """
+    Run a few blank batches through the model before the real frames.
+
+    The first call sets up the predictor (weights on device, FP16 conversion). On CUDA the
+    following ones let cuDNN pick its kernels and, if `compile_model` is set, trigger
+    torch.compile; on the CPU there is nothing to tune, so a single frame is run.
+
+    Args:
+        model (YOLO): Model to warm up.
+        frame_shape (tuple): (height, width, channels) of the frames that will be passed to the model.
+        batch_size (int): Number of frames per inference call.
+        runs (int): Number of warmup calls after the predictor is set up (CUDA only).
+        compile_model (bool): Compile the underlying PyTorch module with torch.compile (CUDA only).
+        **predict_kwargs: Keyword arguments used for the real inference calls, e.g. half=True.
+    """
+    frame = np.zeros(frame_shape, dtype=np.uint8)
+    if not torch.cuda.is_available():
+        model([frame], verbose=False, **predict_kwargs)  # A single frame sets up the predictor
+        return
+
+    batch = [frame] * batch_size
+    model(batch, verbose=False, **predict_kwargs)
+
+    # The predictor wraps the network in an AutoBackend; compile the wrapped PyTorch module
+    backend = model.predictor.model
+    already_compiled = hasattr(backend.model, "_orig_mod")  # Model reused across videos
+    if compile_model and isinstance(backend.model, torch.nn.Module) and not already_compiled:
+        backend.model = torch.compile(backend.model, mode="reduce-overhead")
+
+    for _ in range(runs):
+        model(batch, verbose=False, **predict_kwargs)
+
+
+def set_input_mask(model: YOLO, mask: Optional[np.ndarray]) -> None:
+    """
+    Black out the pixels outside `mask` on the preprocessed input batch, on the model's device.
+
+    Replaces per-frame masking on the CPU: the mask is letterboxed like the frames once,
+    uploaded, and multiplied into every batch after Ultralytics' preprocessing. The model
+    must have been called once (e.g. by `warmup_yolo_model`) so its predictor exists.
+
+    Args:
+        model (YOLO): Model whose input batches get masked.
+        mask (np.ndarray | None): Single channel mask with the frames' height and width; nonzero
+            pixels are kept. None removes a previously set mask.
+    """
+    predictor = model.predictor
+    predictor.__dict__.pop("preprocess", None)  # Back to the predictor's own preprocess
+    if mask is None:
+        return
+
+    preprocess = predictor.preprocess
+    mask_image = np.repeat((mask > 0).astype(np.uint8)[..., None] * 255, 3, axis=2)
+    mask_tensors = {}  # Keyed by device and dtype of the input batch
+
+    def masked_preprocess(im):
+        batch = preprocess(im)
+        key = (batch.device, batch.dtype)
+        if key not in mask_tensors:
+            # Letterboxing pads with gray, so the padding stays as it is on the frames
+            letterboxed = predictor.pre_transform([mask_image])[0][..., 0]
+            mask_tensors[key] = torch.from_numpy(letterboxed != 0).to(device=batch.device, dtype=batch.dtype)[None, None]
+        return batch * mask_tensors[key]
+
+    predictor.preprocess = masked_preprocess